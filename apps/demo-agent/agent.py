@@ -11,14 +11,33 @@
 # =============================================================================
 
 import asyncio
+import functools
 import httpx
-import json
+import logging
+import logging.handlers
+import orjson
 import base64
+import queue
 import time
-import secrets
 import os
+
+# Route secp256k1 signing through coincurve's libsecp256k1 C bindings
+# (5-20x faster than the pure-Python fallback). Must be set before
+# eth_account/eth_keys are imported.
+os.environ.setdefault("ECC_BACKEND_CLASS", "eth_keys.backends.CoinCurveECCBackend")
+
+# Use the pysha3 C extension for Keccak-256 instead of eth-hash's
+# fallback backend. Must be set before eth_utils is imported.
+os.environ.setdefault("ETH_HASH_BACKEND", "pysha3")
+
+import coincurve
+import msgspec
+import sha3
+
+from eth_abi import encode as abi_encode
+from eth_abi.registry import registry as abi_registry
 from eth_account import Account
-from eth_account.messages import encode_typed_data
+from eth_utils import keccak
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -59,10 +78,192 @@ else:
 EIP712_DOMAIN_NAME = "Bridged USDC (Stargate)"  # ✅ CORRECT (was "USD Coin")
 EIP712_DOMAIN_VERSION = "1"                      # ✅ CORRECT (was "2")
 
+# Opt-in: sign with the minimal EIP712Domain(address verifyingContract)
+# variant instead of the full name/version/chainId domain. Shorter
+# preimage and no name/version hashing, but the server MUST accept the
+# minimal domain - leave off unless the facilitator supports it.
+EIP712_MINIMAL_DOMAIN = os.getenv("EIP712_MINIMAL_DOMAIN", "false").lower() in ("1", "true", "yes")
+
 # Server URLs
 MARKET_DATA_SERVER_URL = os.getenv("MARKET_DATA_SERVER_URL", "http://localhost:3001")
 ONCHAIN_ANALYTICS_SERVER_URL = os.getenv("ONCHAIN_ANALYTICS_SERVER_URL", "http://localhost:3002")
 
+# =============================================================================
+# LOGGING
+# =============================================================================
+# Per-call progress lines go through a queue to a background thread so
+# the event loop never blocks on stdout; under gather concurrency,
+# synchronous print() calls would serialize the loop.
+
+logger = logging.getLogger("agent")
+
+
+def _setup_logging() -> logging.handlers.QueueListener:
+    """Start queue-based logging; returns the listener for shutdown."""
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    listener.start()
+    return listener
+
+
+# =============================================================================
+# EIP-712 HASHING - PRECOMPUTED CONSTANTS
+# =============================================================================
+# The domain separator and type hash only depend on immutable inputs, so
+# they are hashed once instead of on every payment (same rationale as
+# OpenZeppelin's cached _domainSeparatorV4).
+
+# keccak256 of the EIP712Domain type signature
+EIP712_DOMAIN_TYPEHASH = keccak(
+    b"EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)"
+)
+
+# keccak256 of the minimal EIP712Domain variant (see EIP712_MINIMAL_DOMAIN)
+EIP712_MINIMAL_DOMAIN_TYPEHASH = keccak(b"EIP712Domain(address verifyingContract)")
+
+# keccak256 of the EIP-3009 TransferWithAuthorization type signature
+TRANSFER_WITH_AUTHORIZATION_TYPEHASH = keccak(
+    b"TransferWithAuthorization(address from,address to,uint256 value,"
+    b"uint256 validAfter,uint256 validBefore,bytes32 nonce)"
+)
+
+# keccak256 of the (constant) domain name and version strings
+_DOMAIN_NAME_HASH = keccak(EIP712_DOMAIN_NAME.encode())
+_DOMAIN_VERSION_HASH = keccak(EIP712_DOMAIN_VERSION.encode())
+
+# Direct handle on the C Keccak for the two per-payment hashes, skipping
+# eth-hash's backend dispatch layer
+_keccak_256 = sha3.keccak_256
+
+# Pre-resolved encoders for the message-specific struct fields, so
+# eth_abi doesn't re-parse the type strings on every payment
+(
+    _ENC_TO,
+    _ENC_VALUE,
+    _ENC_VALID_AFTER,
+    _ENC_VALID_BEFORE,
+    _ENC_NONCE,
+) = (
+    abi_registry.get_encoder(t)
+    for t in ("address", "uint256", "uint256", "uint256", "bytes32")
+)
+
+
+@functools.lru_cache(maxsize=64)
+def _addr_bytes(address: str) -> bytes:
+    """Memoized hex-address -> 20-byte conversion for the ABI encoder."""
+    return bytes.fromhex(address.removeprefix("0x"))
+
+
+@functools.lru_cache(maxsize=16)
+def _domain_separator(verifying_contract: str) -> bytes:
+    """
+    Compute (and memoize) the EIP-712 domain separator for a token contract.
+
+    Everything except the verifying contract is fixed for the configured
+    network, so each asset's separator is hashed exactly once.
+    """
+    if EIP712_MINIMAL_DOMAIN:
+        return keccak(
+            EIP712_MINIMAL_DOMAIN_TYPEHASH
+            + abi_encode(["address"], [verifying_contract])
+        )
+    return keccak(
+        EIP712_DOMAIN_TYPEHASH
+        + _DOMAIN_NAME_HASH
+        + _DOMAIN_VERSION_HASH
+        + abi_encode(["uint256", "address"], [CHAIN_ID, verifying_contract])
+    )
+
+
+# =============================================================================
+# RESPONSE MODELS
+# =============================================================================
+# Typed msgspec structs for the tool responses used by the demo. Servers
+# may answer flat or wrapped in a "result" envelope, so each top-level
+# model carries an optional self-typed "result" field; decoding happens
+# at C level with no intermediate dicts.
+
+
+class Candle(msgspec.Struct):
+    open: float | str | None = None
+    close: float | str | None = None
+
+
+class PriceResp(msgspec.Struct):
+    price: float | str | None = None
+    result: "PriceResp | None" = None
+
+
+class OHLCVResp(msgspec.Struct):
+    candles: list[Candle] = []
+    result: "OHLCVResp | None" = None
+
+
+class BalanceResp(msgspec.Struct):
+    balance: float | str | None = None
+    result: "BalanceResp | None" = None
+
+
+class OrderLevel(msgspec.Struct):
+    price: float | str | None = None
+
+
+class OrderbookResp(msgspec.Struct):
+    bids: list[OrderLevel] = []
+    asks: list[OrderLevel] = []
+    result: "OrderbookResp | None" = None
+
+
+class Trade(msgspec.Struct):
+    price: float | str | None = None
+    side: str | None = None
+
+
+class TradesResp(msgspec.Struct):
+    trades: list[Trade] = []
+    result: "TradesResp | None" = None
+
+
+class Transaction(msgspec.Struct):
+    hash: str | None = None
+
+
+class TransactionsResp(msgspec.Struct):
+    transactions: list[Transaction] = []
+    result: "TransactionsResp | None" = None
+
+
+class TokenTransfer(msgspec.Struct):
+    tokenSymbol: str | None = None
+    value: float | str | None = None
+
+
+class TokenTransfersResp(msgspec.Struct):
+    transfers: list[TokenTransfer] = []
+    result: "TokenTransfersResp | None" = None
+
+
+class ContractInfoResp(msgspec.Struct):
+    contractName: str | None = None
+    isVerified: bool = False
+    result: "ContractInfoResp | None" = None
+
+
+class WalletActivity(msgspec.Struct):
+    totalSent: float | str = "0"
+    totalReceived: float | str = "0"
+    uniqueAddressesInteracted: int = 0
+
+
+class AnalysisResp(msgspec.Struct):
+    activity: WalletActivity | None = None
+    result: "AnalysisResp | None" = None
+
 
 # =============================================================================
 # PAYMENT CLIENT
@@ -87,67 +288,170 @@ class PaymentClient:
         self.wallet_address = self.account.address
         self.max_budget = max_budget
         self.spent = 0
+        # Bound libsecp256k1 signing closure: one C call per signature,
+        # no per-call eth_account dispatch or attribute lookups
+        pk_hex = private_key[2:] if private_key.startswith("0x") else private_key
+        self._sign_recoverable = coincurve.PrivateKey(bytes.fromhex(pk_hex)).sign_recoverable
+        # Immutable per-instance fragments, computed once instead of per
+        # payment: the wallet address as raw bytes and as a pre-encoded
+        # 32-byte ABI word (the first field of every struct preimage).
+        self._from_bytes = bytes.fromhex(self.wallet_address[2:])
+        self._from_word = abi_encode(["address"], [self.wallet_address])
+        # Tools that answered 200 without demanding payment; lets later
+        # calls skip the 402/payment branch entirely
+        self._free_tools: set[tuple[str, str]] = set()
+        # In-flight requests for free tools, keyed by (server, tool,
+        # canonical params) - duplicate concurrent calls share one task
+        self._inflight: dict[tuple, asyncio.Task] = {}
+        # Serializes budget accounting when calls run concurrently
+        self._budget_lock = asyncio.Lock()
+        # One long-lived connection pool for every tool call: keep-alive +
+        # HTTP/2 multiplexing amortize TCP/TLS handshakes across requests
+        # (and across the 402 retry). Closed via aclose().
+        self._http = httpx.AsyncClient(
+            http2=True,
+            timeout=30.0,
+            limits=httpx.Limits(max_keepalive_connections=32),
+            # Default headers sent with every request, so per-call dicts
+            # only carry the payment header when one exists
+            headers={"Content-Type": "application/json"},
+        )
+
+    async def aclose(self):
+        """Close the underlying HTTP connection pool."""
+        await self._http.aclose()
+
+    async def prewarm(self, *base_urls: str):
+        """
+        Open a connection to each server ahead of time.
+
+        Pays DNS + TCP + TLS once during setup so the first real batch
+        of tool calls hits warm keep-alive connections. Failures are
+        ignored - the actual calls will surface any real errors.
+        """
+        await asyncio.gather(
+            *(self._http.head(url) for url in base_urls),
+            return_exceptions=True,
+        )
 
     async def call_tool(
         self,
         server_url: str,
         tool_name: str,
-        params: dict
-    ) -> dict:
+        params: dict,
+        response_type: type | None = None,
+    ) -> dict | msgspec.Struct:
         """
         Call a tool on an MCP server, handling payment automatically.
+
+        When response_type (a msgspec.Struct subclass) is given, the
+        response is decoded straight into that type; otherwise a plain
+        dict is returned with any "result" envelope unwrapped.
+
+        Identical concurrent calls to known-free tools are coalesced
+        into a single request; paid tools always hit the network since
+        every payment needs a fresh nonce and signature.
         """
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # Step 1: Initial request
-            print(f"      → Calling {tool_name}...")
-            response = await client.post(
-                f"{server_url}/tools/{tool_name}",
-                json=params,
-                headers={"Content-Type": "application/json"}
-            )
+        if (server_url, tool_name) not in self._free_tools:
+            return await self._call_tool_impl(server_url, tool_name, params, response_type)
+
+        key = (server_url, tool_name, orjson.dumps(params, option=orjson.OPT_SORT_KEYS))
+        if key in self._inflight:
+            return await self._inflight[key]
+        task = asyncio.ensure_future(
+            self._call_tool_impl(server_url, tool_name, params, response_type)
+        )
+        self._inflight[key] = task
+        try:
+            return await task
+        finally:
+            self._inflight.pop(key, None)
 
-            # Step 2: Handle 402 Payment Required
-            if response.status_code == 402:
-                data = response.json()
-                payment_requirements = data.get("paymentRequirements", {})
+    async def _call_tool_impl(
+        self,
+        server_url: str,
+        tool_name: str,
+        params: dict,
+        response_type: type | None = None,
+    ) -> dict | msgspec.Struct:
+        """Issue the HTTP request(s) for one tool call, paying if asked."""
+        # Step 1: Initial request
+        logger.info("      → Calling %s...", tool_name)
+        tool_key = (server_url, tool_name)
+        known_free = tool_key in self._free_tools
+        response = await self._http.post(
+            f"{server_url}/tools/{tool_name}",
+            json=params,
+        )
+
+        # Step 2: Handle 402 Payment Required (skipped once a tool is
+        # known to be free - no signing context is ever touched)
+        if response.status_code == 402 and not known_free:
+            data = orjson.loads(await response.aread())
+            payment_requirements = data.get("paymentRequirements", {})
 
-                amount = int(payment_requirements.get("maxAmountRequired", "0"))
-                print(f"      → 402 Payment Required: {amount / 1_000_000:.6f} USDC")
+            amount = int(payment_requirements.get("maxAmountRequired", "0"))
+            logger.info("      → 402 Payment Required: %.6f USDC", amount / 1_000_000)
 
-                # Check budget
+            # Check budget and reserve optimistically so concurrent
+            # calls can't collectively overspend
+            async with self._budget_lock:
                 if self.spent + amount > self.max_budget:
                     raise Exception(
                         f"Would exceed budget: {self.spent + amount} > {self.max_budget}"
                     )
-
-                # Create and sign payment with OFFICIAL parameters
-                print(f"      → Signing payment...")
-                print(f"        Domain: name='{EIP712_DOMAIN_NAME}', version='{EIP712_DOMAIN_VERSION}'")
-                payment_header = self._create_payment(payment_requirements)
-
-                # Retry with payment
-                print(f"      → Sending payment to server...")
-                response = await client.post(
-                    f"{server_url}/tools/{tool_name}",
-                    json=params,
-                    headers={
-                        "Content-Type": "application/json",
-                        "X-PAYMENT": payment_header,
-                    }
+                self.spent += amount
+
+            # Create and sign payment with OFFICIAL parameters
+            logger.info("      → Signing payment...")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "        Domain: name='%s', version='%s'",
+                    EIP712_DOMAIN_NAME, EIP712_DOMAIN_VERSION,
                 )
+            # Keccak/secp256k1 are CPU work in C extensions that release
+            # the GIL - run them off the event loop so concurrent calls'
+            # network I/O keeps progressing while payments are signed
+            payment_header = await asyncio.to_thread(
+                self._create_payment, payment_requirements
+            )
 
-                if response.status_code == 200:
-                    self.spent += amount
-                    print(f"      ✅ Payment successful!")
+            # Retry with payment (reuses the keep-alive connection)
+            logger.info("      → Sending payment to server...")
+            response = await self._http.post(
+                f"{server_url}/tools/{tool_name}",
+                json=params,
+                headers={"X-PAYMENT": payment_header},
+            )
 
-            # Step 3: Handle response
-            if response.status_code != 200:
-                raise Exception(
-                    f"Tool call failed: {response.status_code} - {response.text}"
-                )
+            if response.status_code == 200:
+                logger.info("      ✅ Payment successful!")
+            else:
+                # Payment failed - release the reserved budget
+                async with self._budget_lock:
+                    self.spent -= amount
+        elif response.status_code == 200 and not known_free:
+            # Answered without a payment challenge: remember it as free
+            self._free_tools.add(tool_key)
+
+        # Step 3: Handle response
+        if response.status_code != 200:
+            raise Exception(
+                f"Tool call failed: {response.status_code} - {response.text}"
+            )
 
-            result = response.json()
-            return result.get("result", result)
+        # orjson parses the raw body directly - no charset sniffing
+        if not response.headers.get("content-type", "").startswith("application/json"):
+            raise Exception(
+                f"Unexpected content type from {tool_name}: "
+                f"{response.headers.get('content-type', 'unknown')}"
+            )
+        body = await response.aread()
+        if response_type is not None:
+            # C-level parse + structural extraction, no intermediate dicts
+            return msgspec.json.decode(body, type=response_type)
+        result = orjson.loads(body)
+        return result.get("result", result)
 
     def _create_payment(self, requirements: dict) -> str:
         """
@@ -157,48 +461,38 @@ class PaymentClient:
         - name: "Bridged USDC (Stargate)"
         - version: "1"
         """
-        # Generate random nonce (32 bytes)
-        nonce = "0x" + secrets.token_hex(32)
+        # Generate random nonce (32 raw bytes; the struct hash needs
+        # bytes32 anyway, so only hex-encode at the payload boundary)
+        nonce_bytes = os.urandom(32)
 
         # Timestamps (in SECONDS, not milliseconds!)
         valid_after = 0
         valid_before = int(time.time()) + 300  # 5 minutes from now
 
         # =================================================================
-        # EIP-712 Domain - OFFICIAL CRONOS X402 PARAMETERS
+        # EIP-712 Hashing - cached domain separator + type hash
         # =================================================================
-        domain = {
-            "name": EIP712_DOMAIN_NAME,        # "Bridged USDC (Stargate)" ✅
-            "version": EIP712_DOMAIN_VERSION,  # "1" ✅
-            "chainId": CHAIN_ID,
-            "verifyingContract": requirements["asset"],
-        }
-
-        # EIP-712 Types (TransferWithAuthorization from EIP-3009)
-        types = {
-            "TransferWithAuthorization": [
-                {"name": "from", "type": "address"},
-                {"name": "to", "type": "address"},
-                {"name": "value", "type": "uint256"},
-                {"name": "validAfter", "type": "uint256"},
-                {"name": "validBefore", "type": "uint256"},
-                {"name": "nonce", "type": "bytes32"},
-            ]
-        }
-
-        # Message to sign
-        message = {
-            "from": self.wallet_address,
-            "to": requirements["payTo"],
-            "value": int(requirements["maxAmountRequired"]),
-            "validAfter": valid_after,
-            "validBefore": valid_before,
-            "nonce": nonce,
-        }
-
-        # Sign with EIP-712
-        signable = encode_typed_data(domain, types, message)
-        signed = self.account.sign_message(signable)
+        # The domain separator is memoized per asset and the type hash is
+        # a module constant, so only the message-specific struct hash is
+        # computed here.
+        domain_sep = _domain_separator(requirements["asset"])
+
+        struct_hash = _keccak_256(
+            TRANSFER_WITH_AUTHORIZATION_TYPEHASH
+            + self._from_word
+            + _ENC_TO(_addr_bytes(requirements["payTo"]))
+            + _ENC_VALUE(int(requirements["maxAmountRequired"]))
+            + _ENC_VALID_AFTER(valid_after)
+            + _ENC_VALID_BEFORE(valid_before)
+            + _ENC_NONCE(nonce_bytes)
+        ).digest()
+
+        # Sign the EIP-712 digest directly ("\x19\x01" || domainSep ||
+        # structHash) with the bound libsecp256k1 closure. coincurve
+        # returns r||s||recid; Ethereum expects v = recid + 27.
+        digest = _keccak_256(b"\x19\x01" + domain_sep + struct_hash).digest()
+        sig = self._sign_recoverable(digest, hasher=None)
+        signature = sig[:64] + bytes([sig[64] + 27])
 
         # Create payload
         payload = {
@@ -211,14 +505,14 @@ class PaymentClient:
                 "value": requirements["maxAmountRequired"],
                 "validAfter": valid_after,
                 "validBefore": valid_before,
-                "nonce": nonce,
-                "signature": "0x" + signed.signature.hex(),
+                "nonce": "0x" + nonce_bytes.hex(),
+                "signature": "0x" + signature.hex(),
                 "asset": requirements["asset"],
             },
         }
 
-        # Base64 encode
-        return base64.b64encode(json.dumps(payload).encode()).decode()
+        # Base64 encode (orjson serializes straight to bytes)
+        return base64.b64encode(orjson.dumps(payload)).decode("ascii")
 
 
 # =============================================================================
@@ -239,204 +533,209 @@ async def main():
         print("Get testnet tokens from: https://faucet.cronos.org")
         return
 
+    listener = _setup_logging()
+
     # Initialize client
     client = PaymentClient(
         private_key=private_key,
         max_budget=int(os.getenv("MAX_BUDGET", "1000000"))
     )
 
-    print("🚀 CronosMCP Demo Agent")
-    print("=" * 60)
-    print()
-    print("📋 Using OFFICIAL Cronos x402 EIP-712 parameters:")
-    print(f"   Domain Name:    {EIP712_DOMAIN_NAME}")
-    print(f"   Domain Version: {EIP712_DOMAIN_VERSION}")
-    print()
-    print(f"💳 Wallet: {client.wallet_address[:10]}...{client.wallet_address[-8:]}")
-    print(f"💰 Budget: {client.max_budget / 1_000_000:.6f} USDC")
-    print(f"🌐 Network: {NETWORK_ID} (Chain ID: {CHAIN_ID})")
-    print(f"🪙 USDC: {USDC_ADDRESS[:10]}...{USDC_ADDRESS[-8:]}")
-    print()
-
-    if NETWORK == "mainnet":
-        print("✅ Using Stargate USDC.e (EIP-3009 compatible)")
+    try:
+        print("🚀 CronosMCP Demo Agent")
+        print("=" * 60)
+        print()
+        print("📋 Using OFFICIAL Cronos x402 EIP-712 parameters:")
+        print(f"   Domain Name:    {EIP712_DOMAIN_NAME}")
+        print(f"   Domain Version: {EIP712_DOMAIN_VERSION}")
+        print()
+        print(f"💳 Wallet: {client.wallet_address[:10]}...{client.wallet_address[-8:]}")
+        print(f"💰 Budget: {client.max_budget / 1_000_000:.6f} USDC")
+        print(f"🌐 Network: {NETWORK_ID} (Chain ID: {CHAIN_ID})")
+        print(f"🪙 USDC: {USDC_ADDRESS[:10]}...{USDC_ADDRESS[-8:]}")
         print()
 
-    # =================================
-    # Test 1: Free Tool - get_price
-    # =================================
-    print("📊 [FREE] Fetching CRO price...")
-    try:
-        result = await client.call_tool(
-            MARKET_DATA_SERVER_URL,
-            "get_price",
-            {"symbol": "CRO"}
+        if NETWORK == "mainnet":
+            print("✅ Using Stargate USDC.e (EIP-3009 compatible)")
+            print()
+
+        # Warm up connections to both servers so the batched calls below
+        # don't each pay DNS + TCP + TLS on first contact
+        await client.prewarm(MARKET_DATA_SERVER_URL, ONCHAIN_ANALYTICS_SERVER_URL)
+
+        # =================================
+        # Dispatch all 9 tests concurrently
+        # =================================
+        # None of the calls depend on each other's outputs, so instead of
+        # paying 9x network round trips sequentially we fire them all at
+        # once with asyncio.gather and print the summaries in order below.
+        calls = [
+            (MARKET_DATA_SERVER_URL, "get_price", {"symbol": "CRO"}, PriceResp),
+            (MARKET_DATA_SERVER_URL, "get_ohlcv", {"symbol": "BTC", "timeframe": "1h", "limit": 25}, OHLCVResp),
+            (ONCHAIN_ANALYTICS_SERVER_URL, "get_balance", {"address": client.wallet_address}, BalanceResp),
+            (MARKET_DATA_SERVER_URL, "get_orderbook", {"symbol": "BTC", "depth": 5}, OrderbookResp),
+            (MARKET_DATA_SERVER_URL, "get_trades", {"symbol": "CRO", "count": 10}, TradesResp),
+            (ONCHAIN_ANALYTICS_SERVER_URL, "get_transactions", {"address": client.wallet_address, "limit": 5}, TransactionsResp),
+            (ONCHAIN_ANALYTICS_SERVER_URL, "get_token_transfers", {"address": client.wallet_address, "limit": 5}, TokenTransfersResp),
+            (ONCHAIN_ANALYTICS_SERVER_URL, "get_contract_info", {"address": USDC_ADDRESS}, ContractInfoResp),
+            (ONCHAIN_ANALYTICS_SERVER_URL, "analyze_wallet", {"address": client.wallet_address}, AnalysisResp),
+        ]
+
+        (
+            price_res,
+            ohlcv_res,
+            balance_res,
+            orderbook_res,
+            trades_res,
+            txs_res,
+            transfers_res,
+            contract_res,
+            analysis_res,
+        ) = await asyncio.gather(
+            *(
+                client.call_tool(url, name, params, response_type=rtype)
+                for url, name, params, rtype in calls
+            ),
+            return_exceptions=True,
         )
-        price = result.get("price") or result.get("result", {}).get("price")
-        print(f"   CRO Price: ${price or 'N/A'}")
-    except Exception as e:
-        print(f"   ❌ Error: {e}")
 
-    print()
+        # =================================
+        # Test 1: Free Tool - get_price
+        # =================================
+        print("📊 [FREE] Fetching CRO price...")
+        if isinstance(price_res, Exception):
+            print(f"   ❌ Error: {price_res}")
+        else:
+            price = price_res.price or (price_res.result.price if price_res.result else None)
+            print(f"   CRO Price: ${price or 'N/A'}")
 
-    # =================================
-    # Test 2: Paid Tool - get_ohlcv
-    # =================================
-    print("📈 [PAID $0.001] Fetching BTC OHLCV data...")
-    try:
-        result = await client.call_tool(
-            MARKET_DATA_SERVER_URL,
-            "get_ohlcv",
-            {"symbol": "BTC", "timeframe": "1h", "limit": 25}
-        )
-        candles = result.get("candles") or result.get("result", {}).get("candles", [])
-        print(f"   ✅ Got {len(candles)} candles")
-        if candles:
-            latest = candles[-1]
-            print(f"   Latest: Open=${latest.get('open', 'N/A')}, Close=${latest.get('close', 'N/A')}")
-    except Exception as e:
-        print(f"   ❌ Error: {e}")
-
-    print()
-
-    # =================================
-    # Test 3: Free Tool - get_balance
-    # =================================
-    print("💰 [FREE] Fetching wallet balance...")
-    try:
-        result = await client.call_tool(
-            ONCHAIN_ANALYTICS_SERVER_URL,
-            "get_balance",
-            {"address": client.wallet_address}
-        )
-        balance = result.get("balance") or result.get("result", {}).get("balance")
-        print(f"   Balance: {balance or 'N/A'} CRO")
-    except Exception as e:
-        print(f"   ❌ Error: {e}")
-
-    print()
-# =================================
-    # Test 4: Paid Tool - get_orderbook
-    # =================================
-    print("📚 [PAID $0.002] Fetching BTC order book...")
-    try:
-        result = await client.call_tool(
-            MARKET_DATA_SERVER_URL,
-            "get_orderbook",
-            {"symbol": "BTC", "depth": 5}
-        )
-        bids = result.get("bids", [])
-        asks = result.get("asks", [])
-        print(f"   ✅ Got {len(bids)} bids, {len(asks)} asks")
-        if bids:
-            print(f"   Best bid: ${bids[0].get('price', 'N/A')}")
-    except Exception as e:
-        print(f"   ❌ Error: {e}")
-
-    print()
-
-    # =================================
-    # Test 5: Paid Tool - get_trades
-    # =================================
-    print("🔄 [PAID $0.001] Fetching recent CRO trades...")
-    try:
-        result = await client.call_tool(
-            MARKET_DATA_SERVER_URL,
-            "get_trades",
-            {"symbol": "CRO", "count": 10}
-        )
-        trades = result.get("trades", [])
-        print(f"   ✅ Got {len(trades)} recent trades")
-        if trades:
-            print(f"   Latest: {trades[0].get('price', 'N/A')} @ {trades[0].get('side', 'N/A')}")
-    except Exception as e:
-        print(f"   ❌ Error: {e}")
-
-    print()
-
-    # =================================
-    # Test 6: Paid Tool - get_transactions
-    # =================================
-    print("📜 [PAID $0.001] Fetching wallet transactions...")
-    try:
-        result = await client.call_tool(
-            ONCHAIN_ANALYTICS_SERVER_URL,
-            "get_transactions",
-            {"address": client.wallet_address, "limit": 5}
-        )
-        txs = result.get("transactions", [])
-        print(f"   ✅ Got {len(txs)} transactions")
-        if txs:
-            print(f"   Latest tx: {txs[0].get('hash', 'N/A')[:20]}...")
-    except Exception as e:
-        print(f"   ❌ Error: {e}")
-
-    print()
-
-    # =================================
-    # Test 7: Paid Tool - get_token_transfers
-    # =================================
-    print("🪙 [PAID $0.002] Fetching token transfers...")
-    try:
-        result = await client.call_tool(
-            ONCHAIN_ANALYTICS_SERVER_URL,
-            "get_token_transfers",
-            {"address": client.wallet_address, "limit": 5}
-        )
-        transfers = result.get("transfers", [])
-        print(f"   ✅ Got {len(transfers)} token transfers")
-        if transfers:
-            print(f"   Latest: {transfers[0].get('tokenSymbol', 'N/A')} - {transfers[0].get('value', 'N/A')}")
-    except Exception as e:
-        print(f"   ❌ Error: {e}")
-
-    print()
-
-    # =================================
-    # Test 8: Paid Tool - get_contract_info
-    # =================================
-    print("📋 [PAID $0.001] Fetching USDC contract info...")
-    try:
-        result = await client.call_tool(
-            ONCHAIN_ANALYTICS_SERVER_URL,
-            "get_contract_info",
-            {"address": USDC_ADDRESS}
-        )
-        print(f"   ✅ Contract: {result.get('contractName', 'Unknown')}")
-        print(f"   Verified: {result.get('isVerified', False)}")
-    except Exception as e:
-        print(f"   ❌ Error: {e}")
+        print()
 
-    print()
+        # =================================
+        # Test 2: Paid Tool - get_ohlcv
+        # =================================
+        print("📈 [PAID $0.001] Fetching BTC OHLCV data...")
+        if isinstance(ohlcv_res, Exception):
+            print(f"   ❌ Error: {ohlcv_res}")
+        else:
+            candles = ohlcv_res.candles or (ohlcv_res.result.candles if ohlcv_res.result else [])
+            print(f"   ✅ Got {len(candles)} candles")
+            if candles:
+                latest = candles[-1]
+                print(f"   Latest: Open=${latest.open or 'N/A'}, Close=${latest.close or 'N/A'}")
 
-    # =================================
-    # Test 9: Paid Tool - analyze_wallet (Most expensive)
-    # =================================
-    print("🔍 [PAID $0.005] Deep wallet analysis...")
-    try:
-        result = await client.call_tool(
-            ONCHAIN_ANALYTICS_SERVER_URL,
-            "analyze_wallet",
-            {"address": client.wallet_address}
-        )
-        activity = result.get("activity", {})
-        print(f"   ✅ Analysis complete")
-        print(f"   Total sent: {activity.get('totalSent', '0')} CRO")
-        print(f"   Total received: {activity.get('totalReceived', '0')} CRO")
-        print(f"   Unique interactions: {activity.get('uniqueAddressesInteracted', 0)}")
-    except Exception as e:
-        print(f"   ❌ Error: {e}")
-
-    print()
-    # =================================
-    # Summary
-    # =================================
-    print("=" * 60)
-    print(f"📈 Total spent: {client.spent / 1_000_000:.6f} USDC")
-    print(f"💵 Remaining: {(client.max_budget - client.spent) / 1_000_000:.6f} USDC")
-
-    if client.spent > 0:
-        print(f"\n🔗 View transactions: {EXPLORER_URL}/address/{client.wallet_address}")
+        print()
+
+        # =================================
+        # Test 3: Free Tool - get_balance
+        # =================================
+        print("💰 [FREE] Fetching wallet balance...")
+        if isinstance(balance_res, Exception):
+            print(f"   ❌ Error: {balance_res}")
+        else:
+            balance = balance_res.balance or (balance_res.result.balance if balance_res.result else None)
+            print(f"   Balance: {balance or 'N/A'} CRO")
+
+        print()
+
+        # =================================
+        # Test 4: Paid Tool - get_orderbook
+        # =================================
+        print("📚 [PAID $0.002] Fetching BTC order book...")
+        if isinstance(orderbook_res, Exception):
+            print(f"   ❌ Error: {orderbook_res}")
+        else:
+            bids = orderbook_res.bids or (orderbook_res.result.bids if orderbook_res.result else [])
+            asks = orderbook_res.asks or (orderbook_res.result.asks if orderbook_res.result else [])
+            print(f"   ✅ Got {len(bids)} bids, {len(asks)} asks")
+            if bids:
+                print(f"   Best bid: ${bids[0].price or 'N/A'}")
+
+        print()
+
+        # =================================
+        # Test 5: Paid Tool - get_trades
+        # =================================
+        print("🔄 [PAID $0.001] Fetching recent CRO trades...")
+        if isinstance(trades_res, Exception):
+            print(f"   ❌ Error: {trades_res}")
+        else:
+            trades = trades_res.trades or (trades_res.result.trades if trades_res.result else [])
+            print(f"   ✅ Got {len(trades)} recent trades")
+            if trades:
+                print(f"   Latest: {trades[0].price or 'N/A'} @ {trades[0].side or 'N/A'}")
+
+        print()
+
+        # =================================
+        # Test 6: Paid Tool - get_transactions
+        # =================================
+        print("📜 [PAID $0.001] Fetching wallet transactions...")
+        if isinstance(txs_res, Exception):
+            print(f"   ❌ Error: {txs_res}")
+        else:
+            txs = txs_res.transactions or (txs_res.result.transactions if txs_res.result else [])
+            print(f"   ✅ Got {len(txs)} transactions")
+            if txs:
+                print(f"   Latest tx: {(txs[0].hash or 'N/A')[:20]}...")
+
+        print()
+
+        # =================================
+        # Test 7: Paid Tool - get_token_transfers
+        # =================================
+        print("🪙 [PAID $0.002] Fetching token transfers...")
+        if isinstance(transfers_res, Exception):
+            print(f"   ❌ Error: {transfers_res}")
+        else:
+            transfers = transfers_res.transfers or (transfers_res.result.transfers if transfers_res.result else [])
+            print(f"   ✅ Got {len(transfers)} token transfers")
+            if transfers:
+                print(f"   Latest: {transfers[0].tokenSymbol or 'N/A'} - {transfers[0].value or 'N/A'}")
+
+        print()
+
+        # =================================
+        # Test 8: Paid Tool - get_contract_info
+        # =================================
+        print("📋 [PAID $0.001] Fetching USDC contract info...")
+        if isinstance(contract_res, Exception):
+            print(f"   ❌ Error: {contract_res}")
+        else:
+            info = contract_res.result or contract_res
+            print(f"   ✅ Contract: {info.contractName or 'Unknown'}")
+            print(f"   Verified: {info.isVerified}")
+
+        print()
+
+        # =================================
+        # Test 9: Paid Tool - analyze_wallet (Most expensive)
+        # =================================
+        print("🔍 [PAID $0.005] Deep wallet analysis...")
+        if isinstance(analysis_res, Exception):
+            print(f"   ❌ Error: {analysis_res}")
+        else:
+            activity = analysis_res.activity or (
+                analysis_res.result.activity if analysis_res.result else None
+            ) or WalletActivity()
+            print(f"   ✅ Analysis complete")
+            print(f"   Total sent: {activity.totalSent} CRO")
+            print(f"   Total received: {activity.totalReceived} CRO")
+            print(f"   Unique interactions: {activity.uniqueAddressesInteracted}")
+
+        print()
+        # =================================
+        # Summary
+        # =================================
+        print("=" * 60)
+        print(f"📈 Total spent: {client.spent / 1_000_000:.6f} USDC")
+        print(f"💵 Remaining: {(client.max_budget - client.spent) / 1_000_000:.6f} USDC")
+
+        if client.spent > 0:
+            print(f"\n🔗 View transactions: {EXPLORER_URL}/address/{client.wallet_address}")
+    finally:
+        await client.aclose()
+        listener.stop()
 
 
 if __name__ == "__main__":